@@ -1,78 +1,16 @@
 import sys
-from collections import deque
-from typing import List, Set, Optional, Union, Literal
-from pydantic import BaseModel
-
-class StateType(BaseModel):
-    """Model representing a state type in the FSM"""
-    value: Union[Literal["BR"], Literal["WC"], str]
-    
-    def model_post_init(self, __context):
-        if self.value not in ["BR", "WC"] and len(self.value) != 1:
-            raise ValueError("StateType must be 'BR', 'WC', or a single character")
-
-class FSMState(BaseModel):
-    """Model representing a state in the finite state machine"""
-    state_num: int
-    state_type: StateType
-    next1: int
-    next2: int
-
-class FiniteStateMachine(BaseModel):
-    """Model representing the entire finite state machine"""
-    states: List[FSMState] = []
-    
-    def add_state(self, state_num: int, state_type: Union[str, StateType], next1: int, next2: int):
-        """Add a new state to the FSM"""
-        if isinstance(state_type, str):
-            state_type = StateType(value=state_type)
-        
-        self.states.append(FSMState(
-            state_num=state_num,
-            state_type=state_type,
-            next1=next1,
-            next2=next2
-        ))
-    
-    def get_state(self, state_num: int) -> Optional[FSMState]:
-        """Get a state by number"""
-        for state in self.states:
-            if state.state_num == state_num:
-                return state
-        return None
-    
-    def update_state(self, state_num: int, next1: Optional[int] = None, next2: Optional[int] = None):
-        """Update a state's next states"""
-        for state in self.states:
-            if state.state_num == state_num:
-                if next1 is not None:
-                    state.next1 = next1
-                if next2 is not None:
-                    state.next2 = next2
-                return True
-        return False
-    
-    def to_arrays(self):
-        """Convert the FSM to arrays for the searcher"""
-        sorted_states = sorted(self.states, key=lambda s: s.state_num)
-        
-        state_type_list = []
-        next1_list = []
-        next2_list = []
-        
-        for state in sorted_states:
-            state_type_list.append(state.state_type.value)
-            next1_list.append(state.next1)
-            next2_list.append(state.next2)
-            
-        return state_type_list, next1_list, next2_list
-    
-    def print_fsm(self):
-        """Print the FSM in the format: state_num,state_type,next1,next2"""
-        sorted_states = sorted(self.states, key=lambda s: s.state_num)
-        
-        for state in sorted_states:
-            print(f"{state.state_num},{state.state_type.value},{state.next1},{state.next2}")
+from array import array
+
+try:
+    import numpy as np
+    from numba import njit, prange
+except ImportError:  # numba is optional, the searcher falls back to pure Python
+    njit = None
+
+
+BR = -1     # State type of a branch state
+WC = -2     # State type of a wildcard; a literal's state type is its byte
+END = -1    # Next state of the end state
 
 
 class REcompiler:
@@ -80,18 +18,23 @@ class REcompiler:
     
     def __init__(self, regexp: str):
         """Initialize the compiler with the given regular expression pattern"""
-        self.BR = "BR"       # Branch state indicator
-        self.WC = "WC"       # Wildcard character
-        self.END = -1        # End state marker
-        
         # Parser state
         self.pattern = regexp + '\0'  # Append null terminator for parsing
         self.chars = list(self.pattern)   # Convert to character array
         self.pos = 0                    # Current position in pattern
         self.state_num = 1              # Current state number
         
-        self.fsm = FiniteStateMachine()
-        self.fsm.add_state(0, self.BR, 0, 0)
+        # FSM stored as parallel arrays indexed by state number; a state's
+        # type is BR, WC or the byte value of the literal it matches.
+        # Each pattern byte adds at most one state, so this size bounds the
+        # states and forward references; compile() trims the excess
+        max_states = 2 * len(regexp.encode('utf-8', 'surrogateescape')) + 4
+        self.state_type = array('i', [BR]) * max_states
+        self.next1 = array('i', [0]) * max_states
+        self.next2 = array('i', [0]) * max_states
+        
+        # First state of each multi-byte literal chain -> its last state
+        self.chain_end = {}
     
     def compile(self):
         """Compile the regex into a FSM and return it in array format"""
@@ -102,40 +45,49 @@ class REcompiler:
             self.error("Not a proper regular expression - unexpected characters at end")
             
         # Connect dummy start to actual start (state 0 branches to initial state)
-        self.fsm.update_state(0, initial_state, initial_state)
+        self.next1[0] = initial_state
+        self.next2[0] = initial_state
         
         # Add end marker state
-        self.fsm.add_state(self.state_num, self.BR, self.END, self.END)
+        self.set_state(self.state_num, BR, END, END)
+        
+        del self.state_type[self.state_num + 1:]
+        del self.next1[self.state_num + 1:]
+        del self.next2[self.state_num + 1:]
         
-        # Convert to arrays for the searcher
-        return self.fsm.to_arrays()
+        return self.state_type, self.next1, self.next2
     
     def print_fsm(self):
-        """Print the FSM in the required format"""
-        self.fsm.print_fsm()
-        
-    def add_state(self, char_type: str, next_state1: int, next_state2: int):
+        """Print the FSM in the format: state_num,state_type,next1,next2"""
+        for i in range(len(self.state_type)):
+            print(f"{i},{self.type_name(self.state_type[i])},{self.next1[i]},{self.next2[i]}")
+    
+    def type_name(self, state_type: int):
+        """Decode a state type back to its display form"""
+        if state_type == BR:
+            return "BR"
+        if state_type == WC:
+            return "WC"
+        if state_type >= 128:
+            return f"\\x{state_type:02x}"  # Part of a non-ASCII character
+        return chr(state_type)
+        
+    def add_state(self, char_type: int, next_state1: int, next_state2: int):
         """Add a new state to the FSM"""
-        self.fsm.add_state(self.state_num, char_type, next_state1, next_state2)
+        self.set_state(self.state_num, char_type, next_state1, next_state2)
         self.state_num += 1
         return self.state_num - 1
         
-    def set_state(self, state_id: int, char_type: str, next_state1: int, next_state2: int):
+    def set_state(self, state_id: int, char_type: int, next_state1: int, next_state2: int):
         """Set or update the given state"""
-        state = self.fsm.get_state(state_id)
-        if state:
-            state.state_type = StateType(value=char_type)
-            state.next1 = next_state1
-            state.next2 = next_state2
-        else:
-            # Add new state
-            self.fsm.add_state(state_id, char_type, next_state1, next_state2)
-            # Also add any intermediate states if needed
-            for i in range(len(self.fsm.states), state_id):
-                self.fsm.add_state(i, self.BR, 0, 0)
+        self.state_type[state_id] = char_type
+        self.next1[state_id] = next_state1
+        self.next2[state_id] = next_state2
         
     def expression(self):
         """Parse an expression (lowest precedence, handles alternation '|')"""
+        next1, next2 = self.next1, self.next2
+        
         # Save the state before this factor to handle alternation properly
         previous_state = self.state_num - 1
         
@@ -143,46 +95,42 @@ class REcompiler:
         term1_state = self.term()
         result_state = term1_state
         
-        if self.pos < len(self.chars) and self.chars[self.pos] == '|':
-            state = self.fsm.get_state(previous_state)
-            if state and state.next1 == state.next2:
-                state.next2 = self.state_num
-                
-            if state:
-                state.next1 = self.state_num
+        if self.chars[self.pos] == '|':
+            state_num = self.state_num
+            if next1[previous_state] == next2[previous_state]:
+                next2[previous_state] = state_num
+            next1[previous_state] = state_num
             
-            previous_state = self.state_num - 1
+            previous_state = state_num - 1
             self.pos += 1
             
             # Create branch state for alternation
-            result_state = self.state_num
-            self.state_num += 1
+            result_state = state_num
+            self.state_num = state_num + 1
             
             # Parse the second term (after '|')
             term2_state = self.expression()
             
             # Set the branch state to point to both terms
-            self.set_state(result_state, self.BR, term1_state, term2_state)
+            self.set_state(result_state, BR, term1_state, term2_state)
             
             # Update previous states to point to the end
-            state = self.fsm.get_state(previous_state)
-            if state and state.next1 == state.next2:
-                state.next2 = self.state_num
-                
-            if state:
-                state.next1 = self.state_num
+            state_num = self.state_num
+            if next1[previous_state] == next2[previous_state]:
+                next2[previous_state] = state_num
+            next1[previous_state] = state_num
             
         return result_state
     
     def term(self):
         """Parse a term (concatenation of factors)"""
+        chars = self.chars
         result_state = self.factor()
         
-        # Continue parsing factors as long as we see characters that could start a factor
-        while (self.pos < len(self.chars) and 
-               (self.is_vocab(self.chars[self.pos]) or 
-                self.chars[self.pos] == '(' or 
-                self.chars[self.pos] == '\\')):
+        # Continue parsing factors as long as we see characters that could start
+        # a factor: a vocabulary character, '(' or '\\'. The null terminator
+        # stops the loop at the end of the pattern
+        while chars[self.pos] not in ")*+?|\0":
             # Concatenation is implicit - just keep parsing factors
             self.factor()
             
@@ -194,40 +142,42 @@ class REcompiler:
         primary_state = self.primary()
         result_state = primary_state
         
-        if self.pos < len(self.chars):
-            # Handle zero or one '?' operator
-            if self.chars[self.pos] == '?':
-                # Get primary state and update
-                primary = self.fsm.get_state(primary_state)
-                if primary:
-                    primary.next1 = self.state_num + 1
-                    primary.next2 = self.state_num + 1
-                
-                # Create branch state that either enters primary or skips it
-                self.set_state(self.state_num, self.BR, primary_state, self.state_num + 1)
-                
-                self.pos += 1
-                result_state = self.state_num
-                self.state_num += 1
-                
-            # Handle one or more '+' operator
-            elif self.chars[self.pos] == '+':
-                # Create branch state for repetition
-                self.set_state(self.state_num, self.BR, primary_state, self.state_num + 1)
-                
-                self.pos += 1
-                # Return primary as entry point (ensures at least one match)
-                result_state = primary_state
-                self.state_num += 1
-                
-            # Handle zero or more '*' operator 
-            elif self.chars[self.pos] == '*':
-                # Create branch state for repetition or skip
-                self.set_state(self.state_num, self.BR, self.state_num + 1, primary_state)
-                
-                self.pos += 1
-                result_state = self.state_num
-                self.state_num += 1
+        char = self.chars[self.pos]
+        state_num = self.state_num
+        
+        # Handle zero or one '?' operator
+        if char == '?':
+            # Get primary state and update; a multi-byte literal leaves
+            # through the last state of its chain
+            exit_state = self.chain_end.get(primary_state, primary_state)
+            self.next1[exit_state] = state_num + 1
+            self.next2[exit_state] = state_num + 1
+            
+            # Create branch state that either enters primary or skips it
+            self.set_state(state_num, BR, primary_state, state_num + 1)
+            
+            self.pos += 1
+            result_state = state_num
+            self.state_num = state_num + 1
+            
+        # Handle one or more '+' operator
+        elif char == '+':
+            # Create branch state for repetition
+            self.set_state(state_num, BR, primary_state, state_num + 1)
+            
+            self.pos += 1
+            # Return primary as entry point (ensures at least one match)
+            result_state = primary_state
+            self.state_num = state_num + 1
+            
+        # Handle zero or more '*' operator 
+        elif char == '*':
+            # Create branch state for repetition or skip
+            self.set_state(state_num, BR, state_num + 1, primary_state)
+            
+            self.pos += 1
+            result_state = state_num
+            self.state_num = state_num + 1
         
         return result_state
     
@@ -235,64 +185,495 @@ class REcompiler:
         """Parse a primary element (literal, escaped char, wildcard, subexpression)"""
         result_state = -10  # Default error value
         
-        if self.pos < len(self.chars):
-            # Handle escaped character
-            if self.chars[self.pos] == '\\':
-                self.pos += 1  # Move past the backslash
-                
-                # Check if there's a character after the backslash
-                if self.pos < len(self.chars):
-                    # Create a state for the escaped character
-                    self.set_state(self.state_num, self.chars[self.pos], self.state_num + 1, self.state_num + 1)
-                    self.pos += 1
-                    result_state = self.state_num
-                    self.state_num += 1
-                else:
-                    self.error("Escape at end of pattern")
+        pos = self.pos
+        char = self.chars[pos]
+        
+        # Handle escaped character
+        if char == '\\':
+            pos += 1  # Move past the backslash
+            char = self.chars[pos]
             
-            # Handle normal character or wildcard
-            elif self.is_vocab(self.chars[self.pos]):
-                if self.chars[self.pos] == '.':
-                    # Handle wildcard - matches any character
-                    self.set_state(self.state_num, self.WC, self.state_num + 1, self.state_num + 1)
-                else:
-                    # Handle literal character
-                    self.set_state(self.state_num, self.chars[self.pos], self.state_num + 1, self.state_num + 1)
-                
-                self.pos += 1
-                result_state = self.state_num
-                self.state_num += 1
+            # Check if there's a character after the backslash
+            if char == '\0':
+                self.pos = pos
+                self.error("Escape at end of pattern")
             
-            # Handle parenthesized subexpression
-            elif self.chars[self.pos] == '(':
-                self.pos += 1  # Move past the opening parenthesis
-                
-                # Parse the subexpression
-                result_state = self.expression()
-                
-                # Check for closing parenthesis
-                if self.pos < len(self.chars) and self.chars[self.pos] == ')':
-                    self.pos += 1
-                else:
-                    self.error("Missing closing parenthesis")
+            # Create a state for the escaped character
+            result_state = self.add_literal(char)
+            self.pos = pos + 1
+        
+        # Handle normal character or wildcard
+        elif self.is_vocab(char):
+            if char == '.':
+                # Handle wildcard - matches any byte
+                result_state = self.add_state(WC, self.state_num + 1, self.state_num + 1)
             else:
-                self.error(f"Unexpected character: {self.chars[self.pos]}")
-        else:
+                # Handle literal character
+                result_state = self.add_literal(char)
+            
+            self.pos = pos + 1
+        
+        # Handle parenthesized subexpression
+        elif char == '(':
+            self.pos = pos + 1  # Move past the opening parenthesis
+            
+            # Parse the subexpression
+            result_state = self.expression()
+            
+            # Check for closing parenthesis
+            if self.chars[self.pos] != ')':
+                self.error("Missing closing parenthesis")
+            self.pos += 1
+        
+        elif char == '\0':
             self.error("Unexpected end of pattern")
+        else:
+            self.error(f"Unexpected character: {char}")
             
         return result_state
     
+    def add_literal(self, char: str):
+        """Add a chain of states matching the UTF-8 bytes of char, returning the first"""
+        first_state = self.state_num
+        # surrogateescape gives back the raw bytes of undecodable command line arguments
+        for byte in char.encode('utf-8', 'surrogateescape'):
+            last_state = self.add_state(byte, self.state_num + 1, self.state_num + 1)
+        if last_state != first_state:
+            self.chain_end[first_state] = last_state
+        return first_state
+    
     def is_vocab(self, char):
         """Check if a character is a normal vocabulary character (not special)"""
         return char not in "()\\*+?|" and char != '\0'
     
     def error(self, message):
         """Report a compilation error and exit"""
-        current_char = self.chars[self.pos] if self.pos < len(self.chars) else "EOL"
+        current_char = self.chars[self.pos] if self.chars[self.pos] != '\0' else "EOL"
         sys.stderr.write(f"Error: {message} - near '{current_char}'\n")
         sys.exit(1)
         
 
+MAX_GENERATION = 2**31 - 1   # Largest visited mark that fits an array('i') entry
+
+# Kind of the end state in the matcher's packed FSM; every other state's
+# kind is its state type
+KIND_END = -3
+
+
+def _next_generation(visited, generation):
+    """Return the next visited mark, zero-filling visited when the marks wrap"""
+    if generation >= MAX_GENERATION:
+        for i in range(len(visited)):
+            visited[i] = 0
+        return 1
+    return generation + 1
+
+
+def _closure(fsm, state, out, count, stack, visited, generation):
+    """Add the non-branch states reachable from state to out[count:].
+    
+    State s of fsm is the record fsm[3*s:3*s + 3] holding its kind, next1
+    and next2. A state counts as visited when its entry in visited equals
+    generation. Returns the new count and whether the end state was reached.
+    """
+    num_states = len(fsm) // 3
+    reached_end = False
+    if state < 0 or state >= num_states or visited[state] == generation:
+        return count, reached_end
+    
+    visited[state] = generation
+    stack[0] = state
+    top = 1
+    while top > 0:
+        top -= 1
+        s = stack[top]
+        k = fsm[3 * s]
+        if k == KIND_END:
+            reached_end = True
+            continue
+        if k != BR:
+            out[count] = s
+            count += 1
+            continue
+        
+        # Push both branches, skipping end markers and visited states
+        n1 = fsm[3 * s + 1]
+        n2 = fsm[3 * s + 2]
+        if 0 <= n1 < num_states and visited[n1] != generation:
+            visited[n1] = generation
+            stack[top] = n1
+            top += 1
+        if 0 <= n2 < num_states and visited[n2] != generation:
+            visited[n2] = generation
+            stack[top] = n2
+            top += 1
+    
+    return count, reached_end
+
+
+def _match(fsm, line, start, curr, nxt, stack, visited, generation):
+    """Match the FSM against the bytes of line from start using two state lists.
+    
+    Returns whether it matched and the last visited mark used.
+    """
+    generation = _next_generation(visited, generation)
+    count, _ = _closure(fsm, 0, curr, 0, stack, visited, generation)
+    
+    pos = start
+    while count > 0 and pos < len(line):
+        char = line[pos]
+        pos += 1
+        
+        generation = _next_generation(visited, generation)
+        next_count = 0
+        for i in range(count):
+            # Only literal and wildcard states are in the list, and a
+            # literal's kind is the byte it matches
+            s = curr[i]
+            k = fsm[3 * s]
+            if k == char or k == WC:
+                next_count, reached_end = _closure(fsm, fsm[3 * s + 1], nxt, next_count,
+                                                   stack, visited, generation)
+                # A character has been consumed, so the rest of the list
+                # need not be followed once the end state is reached
+                if reached_end:
+                    return True, generation
+        
+        curr, nxt = nxt, curr
+        count = next_count
+    
+    return False, generation
+
+
+def _search_line(fsm, line, first_byte_lut, curr, nxt, stack, visited, generation):
+    """Check whether the FSM matches at any position in line, skipping
+    positions whose byte cannot begin a match.
+    
+    Returns whether it matched and the last visited mark used.
+    """
+    for start in range(len(line)):
+        if first_byte_lut[line[start]]:
+            matched, generation = _match(fsm, line, start, curr, nxt, stack, visited, generation)
+            if matched:
+                return True, generation
+    return False, generation
+
+
+LINES_PER_CHUNK = 1024   # Lines searched by one parallel task in _search_all
+
+
+def _search_all(fsm, data, starts, ends, first_byte_lut, matched):
+    """Set matched[i] for every line i of data that contains a match.
+    
+    Line i is data[starts[i]:ends[i]]. Lines are searched in
+    parallel chunks, each with its own scratch buffers. Only used when
+    numba is available.
+    """
+    num_states = len(fsm) // 3
+    num_lines = len(starts)
+    num_chunks = (num_lines + LINES_PER_CHUNK - 1) // LINES_PER_CHUNK
+    for chunk in prange(num_chunks):
+        curr = np.empty(num_states, np.int32)
+        nxt = np.empty(num_states, np.int32)
+        stack = np.empty(num_states, np.int32)
+        visited = np.zeros(num_states, np.int32)
+        generation = 0
+        
+        first_line = chunk * LINES_PER_CHUNK
+        for i in range(first_line, min(first_line + LINES_PER_CHUNK, num_lines)):
+            line = data[starts[i]:ends[i]]
+            found, generation = _search_line(fsm, line, first_byte_lut,
+                                             curr, nxt, stack, visited, generation)
+            matched[i] = found
+
+
+def _search_all_dfa(table, start, accept, data, starts, ends, matched):
+    """Set matched[i] for every line i of data that the minimized DFA accepts.
+    
+    table holds 256 entries per state, each the next state's row offset, and
+    start and accept are row offsets. Lines are split as in _search_all and
+    searched in parallel. Only used when numba is available.
+    """
+    for i in prange(len(starts)):
+        state = start
+        for pos in range(starts[i], ends[i]):
+            state = table[state + data[pos]]
+            if state == accept:
+                matched[i] = True
+                break
+
+
+if njit is not None:
+    _next_generation = njit(cache=True)(_next_generation)
+    _closure = njit(cache=True)(_closure)
+    _match = njit(cache=True)(_match)
+    _search_line = njit(cache=True)(_search_line)
+    _search_all = njit(cache=True, parallel=True)(_search_all)
+    _search_all_dfa = njit(cache=True, parallel=True)(_search_all_dfa)
+
+
+MISSING = -1   # DFA transition not computed yet
+
+
+class DFA:
+    """Deterministic automaton built from the FSM by subset construction.
+    
+    Each DFA state is the set of character-matching FSM states that are in
+    progress after some input. The start state's closure is merged in before
+    every step, so a single pass over a line tries every start position at
+    once. Reaching the end state moves to an absorbing accept state.
+    """
+    
+    def __init__(self, state_type, next1, next2, max_states: int = 4096):
+        """Set up the start and accept states; minimize() fills in the rest"""
+        self.state_type = state_type
+        self.next1 = next1
+        self.next2 = next2
+        self.max_states = max_states
+        
+        self.transitions = []   # DFA state -> 256 next states, indexed by byte
+        self.table = None       # Flat transition table once built and minimized
+        self.accept = set()     # Accepting DFA states
+        self.state_sets = []    # DFA state -> set of FSM states it stands for
+        self.state_ids = {}     # Set of FSM states -> DFA state
+        
+        # An empty match at the start does not count, so the end state is ignored here
+        self.start_states, _ = self.closure([0])
+        self.start = self.add_dfa_state(frozenset())
+        self.set_first_bytes()
+        
+        # The accept state loops to itself on every byte, so it is never
+        # stepped and stays out of state_ids
+        self.accept_state = len(self.transitions)
+        self.transitions.append([self.accept_state] * 256)
+        self.state_sets.append(frozenset())
+        self.accept.add(self.accept_state)
+        
+    def set_first_bytes(self):
+        """Work out which bytes can begin a match, so positions that cannot
+        start one are skipped without entering the automaton"""
+        first = {self.state_type[state] for state in self.start_states}
+        if WC in first:
+            self.first_codes = None   # Any character can start a match
+            self.first_byte_lut = bytes([1]) * 256
+            self.prefix = b''
+            return
+        
+        self.first_codes = first
+        self.first_byte_lut = bytes(1 if char in first else 0 for char in range(256))
+        self.prefix = self.required_prefix()
+    
+    def required_prefix(self):
+        """Return the literal bytes every match starts with.
+        
+        Follows the FSM from the start while every state in progress is a
+        literal for the same byte, stopping at a wildcard, a choice of bytes
+        or a point where the match could already end.
+        """
+        prefix = bytearray()
+        states = self.start_states
+        # A prefix longer than the FSM would mean we are going round a loop
+        while states and len(prefix) < len(self.state_type):
+            codes = {self.state_type[state] for state in states}
+            if len(codes) != 1 or WC in codes:
+                break
+            
+            prefix.append(codes.pop())
+            states, reached_end = self.closure([self.next1[state] for state in states])
+            if reached_end:
+                break
+        
+        return bytes(prefix)
+    
+    def find_start(self, data, pos: int):
+        """Return the first position from pos that can begin a match, or -1
+        if there is none"""
+        if self.prefix:
+            return data.find(self.prefix, pos)
+        
+        if self.first_codes is None:
+            return pos if pos < len(data) else -1
+        
+        lut = self.first_byte_lut
+        while pos < len(data):
+            if lut[data[pos]]:
+                return pos
+            pos += 1
+        return -1
+    
+    def add_dfa_state(self, fsm_states):
+        """Register a set of FSM states as a new DFA state and return its number"""
+        dfa_state = len(self.transitions)
+        self.transitions.append([MISSING] * 256)
+        self.state_sets.append(fsm_states)
+        self.state_ids[fsm_states] = dfa_state
+        return dfa_state
+    
+    def closure(self, states):
+        """Follow branch states from states, returning the character-matching
+        states reached and whether the end state was reached"""
+        reached = set()
+        reached_end = False
+        visited = set()
+        stack = list(states)
+        while stack:
+            state = stack.pop()
+            if state < 0 or state >= len(self.state_type) or state in visited:
+                continue
+            visited.add(state)
+            
+            if self.state_type[state] != BR:
+                reached.add(state)
+            elif self.next1[state] == END and self.next2[state] == END:
+                reached_end = True
+            else:
+                stack.append(self.next1[state])
+                stack.append(self.next2[state])
+        
+        return frozenset(reached), reached_end
+    
+    def step(self, dfa_state: int, char: int):
+        """Compute and cache the transition on char, or return MISSING if the
+        DFA has grown past max_states"""
+        targets = [self.next1[state]
+                   for state in self.state_sets[dfa_state] | self.start_states
+                   if self.state_type[state] in (char, WC)]
+        fsm_states, reached_end = self.closure(targets)
+        
+        if reached_end:
+            next_state = self.accept_state
+        elif fsm_states in self.state_ids:
+            next_state = self.state_ids[fsm_states]
+        elif len(self.transitions) >= self.max_states:
+            return MISSING
+        else:
+            next_state = self.add_dfa_state(fsm_states)
+        
+        self.transitions[dfa_state][char] = next_state
+        return next_state
+    
+    def byte_classes(self):
+        """Group the 256 byte values into classes the FSM cannot tell apart"""
+        literals = {state_type for state_type in self.state_type if state_type >= 0}
+        classes = [[char] for char in sorted(literals)]
+        others = [char for char in range(256) if char not in literals]
+        if others:
+            classes.append(others)
+        return classes
+    
+    def build(self, classes):
+        """Compute every reachable DFA state and transition, returning False if
+        the DFA grows past max_states"""
+        seen = {self.start}
+        pending = [self.start]
+        while pending:
+            dfa_state = pending.pop()
+            row = self.transitions[dfa_state]
+            for chars in classes:
+                next_state = row[chars[0]]
+                if next_state == MISSING:
+                    next_state = self.step(dfa_state, chars[0])
+                    if next_state == MISSING:
+                        return False
+                for char in chars:
+                    row[char] = next_state
+                if next_state not in seen:
+                    seen.add(next_state)
+                    pending.append(next_state)
+        return True
+    
+    def minimize(self):
+        """Build the whole DFA, merge equivalent states with Hopcroft's
+        algorithm and store the result as a flat transition table.
+        
+        Returns False if the DFA grows past max_states.
+        """
+        classes = self.byte_classes()
+        if not self.build(classes):
+            return False
+        
+        num_states = len(self.transitions)
+        symbols = [chars[0] for chars in classes]
+        
+        # Predecessors of each DFA state under each symbol
+        inverse = {char: [[] for _ in range(num_states)] for char in symbols}
+        for dfa_state, row in enumerate(self.transitions):
+            for char in symbols:
+                inverse[char][row[char]].append(dfa_state)
+        
+        # Start from accepting / non-accepting blocks and refine
+        blocks = [set(self.accept), set(range(num_states)) - self.accept]
+        if not blocks[1]:
+            blocks.pop()
+        block_of = [0] * num_states
+        for block_num, block in enumerate(blocks):
+            for dfa_state in block:
+                block_of[dfa_state] = block_num
+        waiting = set(range(len(blocks)))
+        
+        while waiting:
+            splitter = list(blocks[waiting.pop()])
+            for char in symbols:
+                # Group the predecessors of the splitter by their block
+                touched = {}
+                for dfa_state in splitter:
+                    for source in inverse[char][dfa_state]:
+                        touched.setdefault(block_of[source], []).append(source)
+                
+                for block_num, members in touched.items():
+                    if len(members) == len(blocks[block_num]):
+                        continue
+                    
+                    new_block = set(members)
+                    blocks[block_num] -= new_block
+                    new_num = len(blocks)
+                    blocks.append(new_block)
+                    for dfa_state in new_block:
+                        block_of[dfa_state] = new_num
+                    
+                    if block_num in waiting or len(new_block) <= len(blocks[block_num]):
+                        waiting.add(new_num)
+                    else:
+                        waiting.add(block_num)
+        
+        # One row of 256 entries per block, holding next_block * 256 so the
+        # search loop can index with a single addition
+        table = array('i', [0]) * (len(blocks) * 256)
+        for block_num, block in enumerate(blocks):
+            row = self.transitions[next(iter(block))]
+            base = block_num * 256
+            for char in range(256):
+                table[base + char] = block_of[row[char]] * 256
+        
+        self.table = table
+        self.table_start = block_of[self.start] * 256
+        self.table_accept = block_of[self.accept_state] * 256
+        return True
+    
+    def matches(self, data):
+        """Run the minimized DFA over bytes, returning whether the line
+        contains a match"""
+        # Whenever the DFA is back at its start state no match is in
+        # progress, so jump ahead to the next byte that could begin one
+        table = self.table
+        start = self.table_start
+        accept = self.table_accept
+        pos = self.find_start(data, 0)
+        while pos >= 0:
+            state = start
+            for i in range(pos, len(data)):
+                state = table[state + data[i]]
+                if state == accept:
+                    return True
+                if state == start:
+                    pos = i + 1
+                    break
+            else:
+                return False
+            pos = self.find_start(data, pos)
+        return False
+
+
 class REsearcher:
     """Regular Expression Searcher that uses a compiled FSM"""
     
@@ -302,139 +683,135 @@ class REsearcher:
         self.next1 = next1
         self.next2 = next2
         
-        self.BR = "BR"     # Branch state indicator
-        self.WC = "WC"     # Wildcard state indicator
-        self.END = -1      # End state marker
-        self.SCAN = -1     # Scan marker for deque
-        
         self._validate_fsm()
         
+        self.dfa = DFA(state_type, next1, next2)
+        self.first_byte_lut = self.dfa.first_byte_lut
+        self.prefix = self.dfa.prefix
+        if not self.dfa.minimize():
+            self.dfa = None   # Too many DFA states for this pattern, search the FSM
+        
+        # Matcher view of the FSM and scratch buffers reused by every match attempt
+        num_states = len(state_type)
+        self._fsm = self._pack_fsm()
+        self._curr = array('i', [0]) * num_states
+        self._next = array('i', [0]) * num_states
+        self._stack = array('i', [0]) * num_states
+        
+        # A state is in the list being built when its visited mark equals the
+        # current generation, so the marks never need clearing between steps
+        self._visited = array('i', [0]) * num_states
+        self._generation = 0
+        
     def _validate_fsm(self):
-        """Validate the FSM structure using Pydantic models"""
-        try:
-            # Create FSM model from arrays
-            fsm = FiniteStateMachine()
-            for i in range(len(self.state_type)):
-                fsm.add_state(
-                    i, 
-                    self.state_type[i],
-                    self.next1[i],
-                    self.next2[i]
-                )
-        except Exception as e:
-            sys.stderr.write(f"Invalid FSM structure: {str(e)}\n")
+        """Check the FSM arrays line up; their contents come from REcompiler
+        and are trusted"""
+        num_states = len(self.state_type)
+        if len(self.next1) != num_states or len(self.next2) != num_states:
+            sys.stderr.write("Invalid FSM structure: array lengths differ\n")
             sys.exit(1)
         
+    def _pack_fsm(self):
+        """Pack each state into a (kind, next1, next2) record of one array so
+        the matcher reads a state's fields from adjacent memory"""
+        fsm = array('i', [0]) * (3 * len(self.state_type))
+        for i, state_type in enumerate(self.state_type):
+            fsm[3 * i] = KIND_END if self.is_end_br_state(i) else state_type
+            fsm[3 * i + 1] = self.next1[i]
+            fsm[3 * i + 2] = self.next2[i]
+        return fsm
+    
     def search_file(self, filename):
-        """Search for pattern matches in the given file"""
+        """Search for pattern matches in the given file, returning the
+        matching lines as bytes"""
         matching_lines = []
         
         try:
-            with open(filename, 'r', encoding='utf-8') as file:
-                for line in file:
-                    # Strip newline and check for match
-                    line = line.rstrip('\n')
-                    if self.search_pattern_in_line(line):
-                        matching_lines.append(line)
+            with open(filename, 'rb') as file:
+                data = file.read()
         except Exception as e:
             sys.stderr.write(f"Error reading file {filename}: {str(e)}\n")
             sys.exit(1)
-            
-        return matching_lines
-    
-    def search_pattern_in_line(self, line):
-        """Search for a pattern match at any position in the line"""
-        # Try matching from each position in the line
-        for pos in range(len(line)):
-            if self.match_from_position(line, pos):
-                return True
-        return False
-    
-    def match_from_position(self, line, start_pos):
-        """Attempt to match the pattern from the specified position"""
-        # Initialize the deque with scan marker and add start state
-        deq = deque()
-        deq.append(self.SCAN)
-        self.add_state(deq, 0)
         
-        pos = start_pos
-        consumed_input = False
+        if njit is not None:
+            return self.search_buffer(data)
         
-        # Process states until we find a match or exhaust possibilities
-        while deq:
-            state = deq.popleft()
-            
-            # Handle the SCAN marker that separates current and next states
-            if state == self.SCAN:
-                if not deq:
-                    return False  
-                
-                # Move to next character and add new scan marker
-                if pos < len(line):
-                    pos += 1
-                    consumed_input = True
-                    deq.append(self.SCAN)
-                continue
-            
-            # Check if we've reached an end state
-            if self.is_end_br_state(state) and consumed_input:
-                return True  
-            
-            # Handle branch state - add both next states to the front
-            if state < len(self.state_type) and self.state_type[state] == self.BR:
-                self.add_state(deq, self.next1[state])
-                self.add_state(deq, self.next2[state])
-                continue
-            
-            # Skip if we've reached the end of the line
-            if pos >= len(line):
-                continue
-            
-            # Handle wildcard and literal character match
-            input_char = line[pos]
-            if state < len(self.state_type):
-                if self.state_type[state] == self.WC:
-                    deq.append(self.next1[state])
-                elif len(self.state_type[state]) == 1 and self.state_type[state] == input_char:
-                    deq.append(self.next1[state])
+        lines = data.split(b'\n')
+        if lines[-1] == b'':
+            lines.pop()  # Nothing after the final newline
         
-        return False
+        for line in lines:
+            if line.endswith(b'\r'):
+                line = line[:-1]  # Leave out the '\r' of a CRLF line ending
+            if self.search_pattern_in_line(line):
+                matching_lines.append(line)
+            
+        return matching_lines
     
-    def add_state(self, deq, state):
-        """Add a state to the deque, handling branch states recursively"""
-        if state < 0:
-            return  # Invalid or end state
+    def search_buffer(self, data):
+        """Search every line of a bytes buffer at once with the compiled
+        DFA or FSM matcher, running lines in parallel"""
+        buffer = np.frombuffer(data, np.uint8)
+        
+        # Each line ends at a newline, or at the end of a final unterminated line
+        ends = np.flatnonzero(buffer == ord('\n'))
+        if data and not data.endswith(b'\n'):
+            ends = np.append(ends, len(data))
+        starts = np.concatenate((np.zeros(1, ends.dtype), ends[:-1] + 1))[:len(ends)]
+        
+        # Leave out the '\r' of CRLF line endings
+        ends -= (ends > starts) & (buffer[ends - 1] == ord('\r'))
+        
+        matched = np.zeros(len(starts), np.bool_)
+        
+        # The parallel kernels take NumPy views rather than bytes/arrays. The
+        # minimized DFA needs one table lookup per byte, so use it when built.
+        if self.dfa is not None:
+            table = np.frombuffer(self.dfa.table, np.int32)
+            _search_all_dfa(table, self.dfa.table_start, self.dfa.table_accept,
+                            buffer, starts, ends, matched)
+        else:
+            fsm = np.frombuffer(self._fsm, np.int32)
+            first_byte_lut = np.frombuffer(self.first_byte_lut, np.uint8)
+            _search_all(fsm, buffer, starts, ends, first_byte_lut, matched)
         
-        visited = set()
-        self.add_state_recursive(deq, state, visited)
+        return [data[starts[i]:ends[i]] for i in np.flatnonzero(matched)]
     
-    def add_state_recursive(self, deq, state, visited):
-        """Recursively add a state to the deque to handle branch states"""
-        if state < 0 or state in visited:
-            return
-        
-        visited.add(state)
-        
-        # End BR state, add to deque to mark match completion
-        if self.is_end_br_state(state):
-            deq.appendleft(state)
-            return
+    def search_pattern_in_line(self, line):
+        """Search for a pattern match at any position in a line of bytes"""
+        # Use the minimized DFA when it was built, as search_buffer does
+        if self.dfa is not None:
+            return self.dfa.matches(line)
+        
+        # Try matching from each occurrence of the prefix, or else from each
+        # position that could begin a match
+        if self.prefix:
+            pos = line.find(self.prefix)
+            while pos >= 0:
+                if self.match_from_position(line, pos):
+                    return True
+                pos = line.find(self.prefix, pos + 1)
+            return False
         
-        # If branch state, traverse its next states
-        if state < len(self.state_type) and self.state_type[state] == self.BR:
-            self.add_state_recursive(deq, self.next1[state], visited)
-            self.add_state_recursive(deq, self.next2[state], visited)
-        else:
-            deq.appendleft(state)
+        matched, self._generation = _search_line(
+            self._fsm, line, self.first_byte_lut, self._curr, self._next,
+            self._stack, self._visited, self._generation)
+        return matched
+    
+    def match_from_position(self, line, start_pos):
+        """Attempt to match the pattern from the specified position"""
+        matched, self._generation = _match(self._fsm, line, start_pos, self._curr, self._next,
+                                           self._stack, self._visited, self._generation)
+        return matched
     
     def is_end_br_state(self, state):
         """Check if the state is an end branch state"""
         if state < 0 or state >= len(self.state_type):
             return False
         
-        return (self.state_type[state] == self.BR and 
-                self.next1[state] == self.END and 
-                self.next2[state] == self.END)
+        return (self.state_type[state] == BR and 
+                self.next1[state] == END and 
+                self.next2[state] == END)
 
 
 def main():
@@ -461,8 +838,10 @@ def main():
         searcher = REsearcher(state_type, next1, next2)
         matching_lines = searcher.search_file(filename)
         
+        out = sys.stdout.buffer
         for line in matching_lines:
-            print(line)
+            out.write(line)
+            out.write(b'\n')
             
     except Exception as e:
         sys.stderr.write(f"Error: {str(e)}\n")
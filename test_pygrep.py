@@ -0,0 +1,157 @@
+import contextlib
+import io
+import os
+import random
+import tempfile
+import unittest
+
+from pygrep import REcompiler, REsearcher
+
+
+def random_pattern(rnd, depth=0):
+    """Build a random pattern from a small alphabet and every operator"""
+    r = rnd.random()
+    if depth > 3 or r < 0.35:
+        pattern = rnd.choice('abcabé.') if rnd.random() > 0.1 else '\\' + rnd.choice('*+?|().a')
+    elif r < 0.55:
+        pattern = random_pattern(rnd, depth + 1) + random_pattern(rnd, depth + 1)
+    elif r < 0.7:
+        pattern = random_pattern(rnd, depth + 1) + '|' + random_pattern(rnd, depth + 1)
+    else:
+        pattern = '(' + random_pattern(rnd, depth + 1) + ')'
+    if rnd.random() < 0.3:
+        pattern += rnd.choice('*+?')
+    return pattern
+
+
+def compile_pattern(pattern):
+    """Compile a pattern, returning None if the compiler rejects it"""
+    try:
+        with contextlib.redirect_stderr(io.StringIO()):
+            return REcompiler(pattern).compile()
+    except SystemExit:
+        return None
+
+
+def nfa_matches(searcher, line):
+    """Reference result: run the FSM from every position of the line"""
+    return any(searcher.match_from_position(line, pos) for pos in range(len(line)))
+
+
+def matching_lines(pattern, lines):
+    """Return the lines a searcher for pattern finds a match in"""
+    searcher = REsearcher(*compile_pattern(pattern))
+    return [line for line in lines if searcher.search_pattern_in_line(line)]
+
+
+class TestCompiler(unittest.TestCase):
+    """Check compiled patterns against results worked out by hand"""
+
+    def test_optional_multibyte_literal(self):
+        # '?' must skip the whole UTF-8 chain, not jump out after its first
+        # byte. Like 'xa?y', the pattern does not match 'xy'.
+        lines = ['xéy'.encode(), b'xy', b'x\xc3y']
+        self.assertEqual(matching_lines('xé?y', lines), ['xéy'.encode()])
+        self.assertEqual(matching_lines('x(é)?y', lines), ['xéy'.encode()])
+        self.assertEqual(matching_lines('xa?y', [b'xay', b'xy']), [b'xay'])
+
+    def test_quantified_multibyte_literals(self):
+        lines = [b'xy', 'xéy'.encode(), 'xééy'.encode(), b'xby', b'x\xc3\xa9\xc3y']
+        self.assertEqual(matching_lines('xé+y', lines), ['xéy'.encode(), 'xééy'.encode()])
+        self.assertEqual(matching_lines('x(é)+y', lines), ['xéy'.encode(), 'xééy'.encode()])
+        self.assertEqual(matching_lines('xé*y', lines), ['xéy'.encode(), 'xééy'.encode()])
+        self.assertEqual(matching_lines('x(é|b)y', lines), ['xéy'.encode(), b'xby'])
+
+    def test_print_fsm(self):
+        expected = {
+            'ab': ['0,BR,1,1', '1,a,2,2', '2,b,3,3', '3,BR,-1,-1'],
+            'a|b': ['0,BR,2,2', '1,a,4,4', '2,BR,1,3', '3,b,4,4', '4,BR,-1,-1'],
+            'a*b': ['0,BR,2,2', '1,a,2,2', '2,BR,3,1', '3,b,4,4', '4,BR,-1,-1'],
+            '.\\.': ['0,BR,1,1', '1,WC,2,2', '2,.,3,3', '3,BR,-1,-1'],
+            'é+': ['0,BR,1,1', '1,\\xc3,2,2', '2,\\xa9,3,3', '3,BR,1,4', '4,BR,-1,-1'],
+        }
+        for pattern, states in expected.items():
+            compiler = REcompiler(pattern)
+            compiler.compile()
+            out = io.StringIO()
+            with contextlib.redirect_stdout(out):
+                compiler.print_fsm()
+            self.assertEqual(out.getvalue().splitlines(), states, pattern)
+
+    def test_compile_errors(self):
+        expected = {
+            '\\': "Error: Escape at end of pattern - near 'EOL'",
+            'a|': "Error: Unexpected end of pattern - near 'EOL'",
+            '': "Error: Unexpected end of pattern - near 'EOL'",
+            '(a': "Error: Missing closing parenthesis - near 'EOL'",
+            'a)': "Error: Not a proper regular expression - unexpected characters at end - near ')'",
+        }
+        for pattern, message in expected.items():
+            err = io.StringIO()
+            with self.assertRaises(SystemExit), contextlib.redirect_stderr(err):
+                REcompiler(pattern).compile()
+            self.assertEqual(err.getvalue().strip(), message, pattern)
+
+
+class TestEngines(unittest.TestCase):
+    """Check every search engine against the plain FSM simulation"""
+
+    def setUp(self):
+        rnd = random.Random(1)
+        self.patterns = ['a', 'ab', 'a|b', 'a.c', 'x(ab)*y', '(a|b)+c', 'aa*b', 'é', 'a.............c']
+        self.patterns += [random_pattern(rnd) for _ in range(150)]
+        self.lines = [b'', b'a', b'ab', b'abc', b'xaby', b'xababy', b'baaaac', b'a.b', b'(a)',
+                      'aéb'.encode(), b'a\xff\xc3b']
+        self.lines += [bytes(rnd.choice(b'abcxy.*(') for _ in range(rnd.randint(0, 16)))
+                       for _ in range(80)]
+        self.lines += [''.join(rnd.choice('abcé') for _ in range(rnd.randint(0, 10))).encode()
+                       for _ in range(40)]
+
+    def searchers(self):
+        """Yield a searcher for each pattern that compiles, with its pattern"""
+        for pattern in self.patterns:
+            fsm = compile_pattern(pattern)
+            if fsm is not None:
+                yield pattern, REsearcher(*fsm)
+
+    def search_file(self, searcher, lines, ending=b'\n'):
+        """Search a temporary file holding lines and return the matches"""
+        with tempfile.NamedTemporaryFile(delete=False) as file:
+            file.write(ending.join(lines) + ending)
+        try:
+            return searcher.search_file(file.name)
+        finally:
+            os.unlink(file.name)
+
+    def test_dfa_and_fsm_agree(self):
+        for pattern, searcher in self.searchers():
+            expected = [line for line in self.lines if nfa_matches(searcher, line)]
+            with self.subTest(pattern=pattern):
+                if searcher.dfa is not None:
+                    self.assertEqual([line for line in self.lines if searcher.dfa.matches(line)],
+                                     expected)
+                self.assertEqual([line for line in self.lines if searcher.search_pattern_in_line(line)],
+                                 expected)
+                self.assertEqual(self.search_file(searcher, self.lines), expected)
+
+                # Without the DFA, the FSM search with its start skipping
+                searcher.dfa = None
+                self.assertEqual([line for line in self.lines if searcher.search_pattern_in_line(line)],
+                                 expected)
+                self.assertEqual(self.search_file(searcher, self.lines), expected)
+
+    def test_crlf_line_endings(self):
+        searcher = REsearcher(*compile_pattern('a.'))
+        self.assertEqual(self.search_file(searcher, [b'xa', b'ab', b''], b'\r\n'), [b'ab'])
+        searcher.dfa = None
+        self.assertEqual(self.search_file(searcher, [b'xa', b'ab', b''], b'\r\n'), [b'ab'])
+
+    def test_large_dfa_falls_back_to_fsm(self):
+        searcher = REsearcher(*compile_pattern('a.............c'))
+        self.assertIsNone(searcher.dfa)
+        self.assertTrue(searcher.search_pattern_in_line(b'xa1234567890123cx'))
+        self.assertFalse(searcher.search_pattern_in_line(b'xa123456789012cx'))
+
+
+if __name__ == '__main__':
+    unittest.main()